@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of per-frame detections
+
+Re-uploads, looped clips and static intros/outros produce the same frames
+over and over. The cache keys each frame by a digest of a downscaled colour
+thumbnail combined with the detector fingerprint, so a repeated frame reuses
+the boxes found the first time instead of running YOLO again. Boxes are
+stored normalised to [0..1] which makes entries valid across videos of
+different resolutions.
+
+By default the key is strict: any change that survives the downscale (a
+small licence plate in a 4K frame still does) gives a different key.
+Near-duplicate matching is opt-in through ``quant_bits``.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# (boxes as normalised xyxy float32 (N, 4), confidences float32 (N,))
+CachedDetections = Tuple[np.ndarray, np.ndarray]
+
+
+def frame_hash(frame: np.ndarray, thumb_size: int = 512, quant_bits: int = 8) -> bytes:
+    """Digest of *frame* downscaled so its long side is *thumb_size* (aspect ratio kept).
+
+    With the default ``quant_bits=8`` the thumbnail is hashed exactly. Lower
+    values keep only the top ``quant_bits`` bits of every channel, so frames
+    whose thumbnails differ by less than ``256 >> quant_bits`` levels per
+    pixel *may* share a key (e.g. re-encoded copies); this tolerance also
+    hides small objects, so only lower it for footage without them.
+    """
+    height, width = frame.shape[:2]
+    scale = min(1.0, thumb_size / max(height, width))
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    thumb = cv2.resize(frame, size, interpolation=cv2.INTER_AREA) if scale < 1.0 else frame
+    if quant_bits < 8:
+        thumb = thumb >> (8 - quant_bits)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.array(thumb.shape, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(thumb).tobytes())
+    return digest.digest()
+
+
+class DetectionCache:
+    """Bounded LRU cache mapping (frame hash, detector fingerprint) to detections."""
+
+    def __init__(
+        self,
+        max_entries: int = 100_000,
+        path: Optional[str] = None,
+        thumb_size: int = 512,
+        quant_bits: int = 8,
+    ):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        if not 1 <= quant_bits <= 8:
+            raise ValueError("quant_bits must be between 1 and 8")
+        self.max_entries = max_entries
+        self.path = path
+        self.thumb_size = thumb_size
+        self.quant_bits = quant_bits
+
+        self._entries: "OrderedDict[Tuple[bytes, str], CachedDetections]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def hash_frame(self, frame: np.ndarray) -> bytes:
+        """Hash *frame* with this cache's settings; combine with a detector fingerprint to get a key."""
+        return frame_hash(frame, self.thumb_size, self.quant_bits)
+
+    def get(self, key: Tuple[bytes, str]) -> Optional[CachedDetections]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Tuple[bytes, str], detections: CachedDetections) -> None:
+        self._entries[key] = detections
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def load(self, path: str) -> None:
+        """Load entries saved by :meth:`save`, keeping the most recent ones if over capacity."""
+        try:
+            # Plain arrays only: the file may sit on a shared mount, so never unpickle it
+            with np.load(path, allow_pickle=False) as archive:
+                frame_keys = archive["frame_keys"]
+                detector_keys = archive["detector_keys"]
+                boxes = archive["boxes"]
+                confidences = archive["confidences"]
+                offsets = archive["offsets"]
+        except (OSError, ValueError, KeyError) as exc:
+            print(f"[WARN] Could not load detection cache from {path}: {exc}")
+            return
+        if len(offsets) != len(frame_keys) + 1 or len(detector_keys) != len(frame_keys):
+            print(f"[WARN] Could not load detection cache from {path}: inconsistent arrays")
+            return
+
+        for i, detector_key in enumerate(detector_keys.tolist()):
+            start, end = offsets[i], offsets[i + 1]
+            self.put((frame_keys[i].tobytes(), detector_key), (boxes[start:end], confidences[start:end]))
+        self.evictions = 0
+        print(f"Loaded {len(self._entries)} cached frame detections from {path}")
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write the cache to *path* (defaults to the path given at construction) as an ``.npz`` archive.
+
+        Entries are stored column-wise: one key per entry, all boxes and
+        confidences concatenated, and ``offsets`` marking where each entry's
+        rows start and end.
+        """
+        path = path or self.path
+        if not path:
+            return
+        cache_dir = os.path.dirname(path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        keys = list(self._entries.keys())
+        values = list(self._entries.values())
+        counts = np.array([len(b) for b, _ in values], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        boxes = np.concatenate([b for b, _ in values]) if values else np.zeros((0, 4), dtype=np.float32)
+        confidences = np.concatenate([c for _, c in values]) if values else np.zeros(0, dtype=np.float32)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                # uint8 rows rather than a bytes dtype, which would strip trailing NUL bytes
+                frame_keys=np.frombuffer(b"".join(k for k, _ in keys), dtype=np.uint8).reshape(-1, 16),
+                detector_keys=np.array([d for _, d in keys], dtype=str),
+                boxes=boxes.astype(np.float32).reshape(-1, 4),
+                confidences=confidences.astype(np.float32),
+                offsets=offsets,
+            )
+        os.replace(tmp_path, path)
+        print(f"Detection cache saved to: {path} ({len(self._entries)} entries)")
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+        }
+
+    def summary(self) -> str:
+        s = self.stats()
+        return (
+            f"{s['hits']} hits, {s['misses']} misses ({s['hit_rate'] * 100:.1f}% hit rate), "
+            f"{s['entries']} entries, {s['evictions']} evictions"
+        )
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+SQLite-backed job queue for running the pipeline on several nodes
+
+Every node points at the same database file (usually next to the shared
+videos/ directory). Workers claim one video at a time with a lease, keep the
+lease alive with heartbeats while the video is processed and mark the job as
+done or failed afterwards. A job whose lease runs out (worker crashed, node
+rebooted) becomes claimable again until it runs out of attempts.
+
+Jobs are keyed by the content hash of the video plus a fingerprint of the
+detector settings, so the same file is never processed twice with the same
+configuration, even if it is renamed or copied.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_path TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    settings_hash TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker_id TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_expires REAL,
+    heartbeat_at REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    output_path TEXT,
+    error TEXT,
+    UNIQUE (content_hash, settings_hash)
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (settings_hash, status, lease_expires);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL
+);
+"""
+
+
+def file_content_hash(path: str) -> str:
+    """Return the SHA-256 hex digest of the file at *path*."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def settings_fingerprint(processor: Any) -> str:
+    """Combine the processor's detector fingerprints and detect stride into one settings hash."""
+    parts = [det.fingerprint() for det in processor.detectors]
+    parts.append(f"detect_stride={processor.detect_stride}")
+    blob = "\n".join(parts)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def default_worker_id() -> str:
+    """Identify this process as ``<hostname>-<pid>``."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+@dataclass
+class Job:
+    """A claimed row of the ``jobs`` table."""
+
+    id: int
+    video_path: str
+    content_hash: str
+    settings_hash: str
+    attempts: int
+
+
+class JobQueue:
+    """Lease-based job queue stored in a single SQLite file."""
+
+    def __init__(self, db_path: str, lease_seconds: float = 300.0, max_attempts: int = 3):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per operation keeps the queue usable from
+        # the heartbeat thread and holds the database lock as briefly as possible.
+        conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def enqueue(self, video_path: str, settings_hash: str) -> Tuple[int, bool]:
+        """Add *video_path* to the queue.
+
+        Returns the id of the job covering the video and whether it was newly
+        created; an existing job (queued, running, done or failed) with the
+        same content and settings is reused, even if it was enqueued under a
+        different path.
+        """
+        content_hash = self._content_hash(str(video_path))
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO jobs (video_path, content_hash, settings_hash, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (str(video_path), content_hash, settings_hash, time.time()),
+            )
+            if cur.rowcount > 0:
+                return cur.lastrowid, True
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE content_hash = ? AND settings_hash = ?",
+                (content_hash, settings_hash),
+            ).fetchone()
+            return row["id"], False
+
+    def _content_hash(self, video_path: str) -> str:
+        """Content hash of *video_path*, re-read only when its size or mtime changed.
+
+        Every node enqueues the whole directory on start, so hashing each
+        file every time would read the full dataset once per node and launch.
+        """
+        stat = os.stat(video_path)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT content_hash FROM files WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (video_path, stat.st_size, stat.st_mtime_ns),
+            ).fetchone()
+        if row is not None:
+            return row["content_hash"]
+
+        content_hash = file_content_hash(video_path)
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+                (video_path, stat.st_size, stat.st_mtime_ns, content_hash),
+            )
+        return content_hash
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+    def claim(self, worker_id: str, settings_hash: str) -> Optional[Job]:
+        """Lease the oldest claimable job enqueued with *settings_hash* to *worker_id*, or return None.
+
+        Workers only take jobs for their own settings, so a node started with
+        different options never completes another configuration's jobs.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            # Expired leases that used up their attempts will never be retried
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = 'lease expired' "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, now, RUNNING, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT id, video_path, content_hash, settings_hash, attempts FROM jobs "
+                "WHERE settings_hash = ? AND (status = ? OR (status = ? AND lease_expires < ?)) "
+                "ORDER BY id LIMIT 1",
+                (settings_hash, PENDING, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker_id = ?, attempts = attempts + 1, "
+                "lease_expires = ?, heartbeat_at = ?, started_at = ?, error = NULL "
+                "WHERE id = ?",
+                (RUNNING, worker_id, now + self.lease_seconds, now, now, row["id"]),
+            )
+        return Job(
+            id=row["id"],
+            video_path=row["video_path"],
+            content_hash=row["content_hash"],
+            settings_hash=row["settings_hash"],
+            attempts=row["attempts"] + 1,
+        )
+
+    def heartbeat(self, job: Job, worker_id: str) -> bool:
+        """Extend the lease on *job*. Returns False if the lease was lost."""
+        now = time.time()
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, heartbeat_at = ? "
+                "WHERE id = ? AND worker_id = ? AND status = ?",
+                (now + self.lease_seconds, now, job.id, worker_id, RUNNING),
+            )
+            return cur.rowcount > 0
+
+    def complete(self, job: Job, worker_id: str, output_path: Optional[str] = None) -> bool:
+        """Mark *job* as done. Returns False if *worker_id* no longer holds it."""
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, lease_expires = NULL, output_path = ? "
+                "WHERE id = ? AND worker_id = ? AND status = ?",
+                (DONE, time.time(), output_path, job.id, worker_id, RUNNING),
+            )
+            return cur.rowcount > 0
+
+    def fail(self, job: Job, worker_id: str, error: str) -> bool:
+        """Record a failed attempt; the job is retried until ``max_attempts``.
+
+        Returns False if *worker_id* no longer holds the job.
+        """
+        status = FAILED if job.attempts >= self.max_attempts else PENDING
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, lease_expires = NULL, error = ? "
+                "WHERE id = ? AND worker_id = ? AND status = ?",
+                (status, time.time(), error, job.id, worker_id, RUNNING),
+            )
+            return cur.rowcount > 0
+
+    def retry_failed(self, settings_hash: Optional[str] = None) -> int:
+        """Put failed jobs (optionally only those for *settings_hash*) back in the queue.
+
+        Attempts are reset, so each job gets ``max_attempts`` fresh tries.
+        Returns the number of jobs requeued.
+        """
+        query = "UPDATE jobs SET status = ?, attempts = 0, worker_id = NULL, lease_expires = NULL WHERE status = ?"
+        params: List[Any] = [PENDING, FAILED]
+        if settings_hash is not None:
+            query += " AND settings_hash = ?"
+            params.append(settings_hash)
+        with self._transaction() as conn:
+            return conn.execute(query, params).rowcount
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        """All jobs with their status and timings, oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs ORDER BY id").fetchall()
+        return [_job_dict(row) for row in rows]
+
+    def job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Status and timings of one job, or None if it does not exist."""
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_dict(row) if row is not None else None
+
+
+_JOB_COLUMNS = (
+    "id, video_path, status, worker_id, attempts, created_at, started_at, "
+    "finished_at, output_path, error"
+)
+
+
+def _job_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    if row["status"] == DONE and row["started_at"] and row["finished_at"]:
+        job["duration"] = row["finished_at"] - row["started_at"]
+    else:
+        job["duration"] = None
+    return job
+
+
+class _Heartbeat(threading.Thread):
+    """Background thread that keeps a job lease alive."""
+
+    def __init__(self, queue: JobQueue, job: Job, worker_id: str):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.job = job
+        self.worker_id = worker_id
+        # Set once the lease is gone; also used to cancel the running video
+        self.lost_event = threading.Event()
+        self._stop_event = threading.Event()
+
+    @property
+    def lost(self) -> bool:
+        return self.lost_event.is_set()
+
+    def run(self):
+        interval = max(1.0, self.queue.lease_seconds / 3)
+        while not self._stop_event.wait(interval):
+            try:
+                if not self.queue.heartbeat(self.job, self.worker_id):
+                    self.lost_event.set()
+                    print(f"[WARN] Lost lease on job {self.job.id} ({self.job.video_path})")
+                    return
+            except sqlite3.Error as exc:
+                print(f"[WARN] Heartbeat failed for job {self.job.id}: {exc}")
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def run_worker(queue: JobQueue, processor: Any, output_dir: str, worker_id: Optional[str] = None) -> int:
+    """Claim and process jobs matching *processor*'s settings until none are left.
+
+    Returns the number of videos this worker completed.
+    """
+    worker_id = worker_id or default_worker_id()
+    settings_hash = settings_fingerprint(processor)
+    completed = 0
+
+    while True:
+        job = queue.claim(worker_id, settings_hash)
+        if job is None:
+            break
+
+        print(f"\n{'='*50}")
+        print(f"[{worker_id}] Claimed job {job.id}: {job.video_path} (attempt {job.attempts})")
+        output_file = Path(output_dir) / f"{Path(job.video_path).stem}_annotations.json"
+
+        heartbeat = _Heartbeat(queue, job, worker_id)
+        heartbeat.start()
+        try:
+            data = processor.process_video(job.video_path, cancel=heartbeat.lost_event)
+        except Exception as exc:
+            heartbeat.stop()
+            if heartbeat.lost:
+                print(f"Stopped {job.video_path}: lease lost to another worker")
+                continue
+            print(f"Error processing {job.video_path}: {exc}")
+            queue.fail(job, worker_id, str(exc))
+            continue
+        heartbeat.stop()
+
+        # Re-check the lease right before writing: someone else may own the job
+        # now, and their result must not be overwritten
+        if heartbeat.lost or not queue.heartbeat(job, worker_id):
+            print(f"Discarding result for {job.video_path}: lease lost to another worker")
+            continue
+        try:
+            # A job only counts as done once its annotations are on disk
+            processor.save_annotations(data, str(output_file), raise_errors=True)
+        except Exception as exc:
+            queue.fail(job, worker_id, f"Could not write {output_file}: {exc}")
+            continue
+        if not queue.complete(job, worker_id, str(output_file)):
+            print(f"Job {job.id} was taken over before it could be marked done")
+            continue
+        completed += 1
+
+    return completed
@@ -4,6 +4,7 @@ Main script for Multi-Object Detection Pipeline
 """
 
 import argparse
+import json
 import sys
 import os
 from pathlib import Path
@@ -15,7 +16,9 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 project_root = Path(__file__).parent.parent
 os.chdir(project_root)
 
-from multi_detection import Detector, MultiObjectDetectionProcessor
+from detection_cache import DetectionCache
+from job_queue import JobQueue, default_worker_id, run_worker, settings_fingerprint
+from multi_detection import Detector, MultiObjectDetectionProcessor, find_video_files
 
 
 def main():
@@ -37,6 +40,18 @@ Examples:
   
   # Use custom model paths
   python main.py --face-model yolo11m-face.pt --license-model custom-license.pt
+  
+  # Share the work between several nodes (run the same command on every node)
+  python main.py --queue-db videos/jobs.sqlite
+  
+  # Coarse-to-fine on 4K footage: 640px full-frame pass, native-resolution crops
+  python main.py --coarse-imgsz 640
+  
+  # Load settings chosen by tune.py (command-line flags still override them)
+  python main.py --config tuned_config.json
+  
+  # Reuse detections for repeated frames, remembered across runs
+  python main.py --frame-cache --cache-file assets-json/detection_cache.npz
         """
     )
     
@@ -80,7 +95,101 @@ Examples:
         help="Directory to save JSON annotation files (default: assets-json)"
     )
     
+    parser.add_argument(
+        "--queue-db",
+        type=str,
+        help="SQLite job queue shared by all worker nodes; videos are claimed from it instead of processed blindly"
+    )
+    
+    parser.add_argument(
+        "--worker-id",
+        type=str,
+        default=default_worker_id(),
+        help="Worker name recorded in the job queue (default: <hostname>-<pid>)"
+    )
+    
+    parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=300.0,
+        help="How long a claimed job stays leased without a heartbeat (default: 300)"
+    )
+    
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=3,
+        help="Give up on a video after this many failed attempts (default: 3)"
+    )
+    
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Requeue jobs that used up their attempts (with these settings) before starting work"
+    )
+    
+    parser.add_argument(
+        "--imgsz",
+        type=int,
+        help="YOLO inference size (default: model default)"
+    )
+    
+    parser.add_argument(
+        "--coarse-imgsz",
+        type=int,
+        help="Enable coarse-to-fine detection: full frame at this size, then native-resolution crops around low-confidence or small candidates"
+    )
+    
+    parser.add_argument(
+        "--detect-stride",
+        type=int,
+        default=1,
+        help="Run detection on every Nth frame and reuse boxes in between (default: 1)"
+    )
+    
+    parser.add_argument(
+        "--config",
+        type=str,
+        help="JSON file of option defaults, e.g. the tuned_config.json written by tune.py"
+    )
+    
+    parser.add_argument(
+        "--frame-cache",
+        action="store_true",
+        help="Reuse detections for exact and near-duplicate frames across all processed videos"
+    )
+    
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=100_000,
+        help="Maximum number of cached results in total; each (frame, detector) pair is one entry, "
+             "so with two detectors 100000 entries hold 50000 frames (default: 100000)"
+    )
+    
+    parser.add_argument(
+        "--cache-quant-bits",
+        type=int,
+        default=8,
+        help="Bits kept per pixel when hashing frames for the cache; 8 matches only identical "
+             "thumbnails, lower values also match near-duplicates but can miss small objects (default: 8)"
+    )
+    
+    parser.add_argument(
+        "--cache-file",
+        type=str,
+        help="Load/save the frame cache from/to this file (implies --frame-cache)"
+    )
+    
     args = parser.parse_args()
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+        unknown = set(config) - set(vars(args))
+        if unknown:
+            parser.error(f"Unknown option(s) in {args.config}: {', '.join(sorted(unknown))}")
+        parser.set_defaults(**config)
+        args = parser.parse_args()
     
     print("="*60)
     print("Multi-Object Detection Pipeline (Face + License Plate)")
@@ -98,13 +207,17 @@ Examples:
             name="face",
             model_path=args.face_model,
             target_classes=["face"],
-            conf=args.confidence
+            conf=args.confidence,
+            imgsz=args.imgsz,
+            coarse_imgsz=args.coarse_imgsz,
         ),
         Detector(
             name="license_plate",
             model_path=args.license_model,
             target_classes=[],  # Empty list means accept all classes
-            conf=args.confidence
+            conf=args.confidence,
+            imgsz=args.imgsz,
+            coarse_imgsz=args.coarse_imgsz,
         ),
     ]
     
@@ -113,45 +226,77 @@ Examples:
     print(f"- Face detection model: {args.face_model}")
     print(f"- License plate detection model: {args.license_model}")
     print(f"- Confidence threshold: {args.confidence}")
+    if args.detect_stride > 1:
+        print(f"- Detect stride: every {args.detect_stride} frames")
+    if args.coarse_imgsz:
+        print(f"- Coarse-to-fine: {args.coarse_imgsz}px full-frame pass with native-resolution refinement")
+    
+    cache = None
+    if args.frame_cache or args.cache_file:
+        cache = DetectionCache(max_entries=args.cache_size, path=args.cache_file, quant_bits=args.cache_quant_bits)
+        print(f"- Frame cache: up to {args.cache_size} entries" + (f" ({args.cache_file})" if args.cache_file else ""))
     try:
-        processor = MultiObjectDetectionProcessor(detectors)
+        processor = MultiObjectDetectionProcessor(detectors, cache=cache, detect_stride=args.detect_stride)
         
         if args.video:
-            # Process single video
-            print(f"\nProcessing single video: {args.video}")
-            
             video_path = Path(args.video)
             if not video_path.exists():
                 print(f"Error: Video file not found: {args.video}")
                 sys.exit(1)
+            video_files = [video_path]
+        else:
+            video_files = find_video_files(args.videos_dir)
+            if not video_files:
+                print(f"No video files found in {args.videos_dir}")
+                return
+        
+        if args.queue_db:
+            # Shared queue: enqueue everything, then work until nothing is left
+            queue = JobQueue(args.queue_db, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+            settings_hash = settings_fingerprint(processor)
+            known = []
+            for video in video_files:
+                job_id, created = queue.enqueue(str(video), settings_hash)
+                if not created:
+                    known.append((video, job_id))
+            print(f"\nQueue {args.queue_db}: {len(video_files) - len(known)} new job(s), {len(known)} already known")
+            for video, job_id in known:
+                # Same content and settings as an existing job, possibly under another name
+                job = queue.job(job_id)
+                covered_by = "" if job["video_path"] == str(video) else f" (same content as {job['video_path']})"
+                output = f" -> {job['output_path']}" if job["output_path"] else ""
+                print(f"  {video}: job {job_id}{covered_by}, {job['status']}{output}")
+            
+            if args.retry_failed:
+                print(f"Requeued {queue.retry_failed(settings_hash)} failed job(s)")
+            
+            print(f"Worker {args.worker_id} starting...")
+            completed = run_worker(queue, processor, args.output_dir, args.worker_id)
+            
+            counts = queue.counts()
+            print(f"\nWorker {args.worker_id} completed {completed} video(s)")
+            print("Queue status: " + ", ".join(f"{status}={n}" for status, n in counts.items()))
+            
+        elif args.video:
+            # Process single video
+            print(f"\nProcessing single video: {args.video}")
             
             # Generate output filename
-            output_file = Path(args.output_dir) / f"{video_path.stem}_annotations.json"
+            output_file = Path(args.output_dir) / f"{video_files[0].stem}_annotations.json"
             
-            processor.process_video(str(video_path), str(output_file))
+            processor.process_video(str(video_files[0]), str(output_file))
             
         else:
-            # Process all videos in the videos directory
-            videos_dir = Path(args.videos_dir)
+            print(f"\nFound {len(video_files)} video file(s) in {args.videos_dir}:")
+            for i, video in enumerate(video_files, 1):
+                print(f"  {i}. {video.name}")
             
-            # List available videos
-            video_files = []
-            if videos_dir.exists():
-                video_extensions = {'.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v'}
-                for ext in video_extensions:
-                    video_files.extend(videos_dir.glob(f"*{ext}"))
-                    video_files.extend(videos_dir.glob(f"*{ext.upper()}"))
-            
-            if video_files:
-                print(f"\nFound {len(video_files)} video file(s) in {args.videos_dir}:")
-                for i, video in enumerate(video_files, 1):
-                    print(f"  {i}. {video.name}")
-                
-                print(f"\nStarting batch processing...")
-                processor.process_sample_videos(args.videos_dir, args.output_dir)
-            else:
-                print(f"No video files found in {args.videos_dir}")
-                return
+            print(f"\nStarting batch processing...")
+            processor.process_sample_videos(args.videos_dir, args.output_dir)
+        
+        if cache is not None:
+            print(f"\nFrame cache: {cache.summary()}")
+            cache.save()
         
         print("\n" + "="*60)
         print("Processing completed successfully!")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+IoU matching of detections against reference annotations
+
+Used by tune.py to score configurations. Annotations are given in the JSON
+format the pipeline writes (``frame -> [annotation]`` with normalised
+``x, y, width, height`` and a ``class``).
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+
+def annotations_to_arrays(
+    annotations: Dict[Any, List[Dict[str, Any]]], class_ids: Dict[str, int]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Flatten a ``frame -> [annotation]`` mapping into frame ids, class ids and xyxy boxes.
+
+    Classes missing from *class_ids* (e.g. "manual" boxes drawn in the UI) get
+    id -1 and are matched regardless of class. Rows are sorted by frame.
+    """
+    frames, classes, boxes = [], [], []
+    for frame_no, anns in annotations.items():
+        for ann in anns:
+            frames.append(int(frame_no))
+            classes.append(class_ids.get(ann.get("class"), -1))
+            boxes.append((ann["x"], ann["y"], ann["x"] + ann["width"], ann["y"] + ann["height"]))
+
+    frames_arr = np.array(frames, dtype=np.int64)
+    order = np.argsort(frames_arr, kind="stable")
+    return (
+        frames_arr[order],
+        np.array(classes, dtype=np.int64)[order],
+        np.array(boxes, dtype=np.float64).reshape(-1, 4)[order],
+    )
+
+
+def count_matches(
+    pred: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    gt: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    iou_threshold: float = 0.5,
+) -> int:
+    """Number of one-to-one IoU matches between predictions and ground truth.
+
+    Both arguments come from :func:`annotations_to_arrays`. All candidate
+    pairs (same frame, compatible class) are scored at once in NumPy; pairs
+    above the threshold are then taken in descending IoU order and kept
+    only if neither box has been matched yet.
+    """
+    pred_frames, pred_cls, pred_boxes = pred
+    gt_frames, gt_cls, gt_boxes = gt
+    if len(pred_frames) == 0 or len(gt_frames) == 0:
+        return 0
+
+    # Every prediction paired with every ground-truth box of the same frame
+    starts = np.searchsorted(gt_frames, pred_frames, side="left")
+    counts = np.searchsorted(gt_frames, pred_frames, side="right") - starts
+    pred_idx = np.repeat(np.arange(len(pred_frames)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    gt_idx = np.repeat(starts, counts) + offsets
+
+    compatible = (pred_cls[pred_idx] == gt_cls[gt_idx]) | (gt_cls[gt_idx] < 0)
+    pred_idx, gt_idx = pred_idx[compatible], gt_idx[compatible]
+
+    p, g = pred_boxes[pred_idx], gt_boxes[gt_idx]
+    iw = np.clip(np.minimum(p[:, 2], g[:, 2]) - np.maximum(p[:, 0], g[:, 0]), 0, None)
+    ih = np.clip(np.minimum(p[:, 3], g[:, 3]) - np.maximum(p[:, 1], g[:, 1]), 0, None)
+    inter = iw * ih
+    union = (p[:, 2] - p[:, 0]) * (p[:, 3] - p[:, 1]) + (g[:, 2] - g[:, 0]) * (g[:, 3] - g[:, 1]) - inter
+    iou = inter / np.maximum(union, 1e-12)
+
+    # Greedy one-to-one assignment: best IoU first, both boxes must still be free
+    valid = iou >= iou_threshold
+    order = np.argsort(-iou[valid], kind="stable")
+    pred_used = np.zeros(len(pred_frames), dtype=bool)
+    gt_used = np.zeros(len(gt_frames), dtype=bool)
+    matches = 0
+    for p_i, g_i in zip(pred_idx[valid][order].tolist(), gt_idx[valid][order].tolist()):
+        if pred_used[p_i] or gt_used[g_i]:
+            continue
+        pred_used[p_i] = gt_used[g_i] = True
+        matches += 1
+    return matches
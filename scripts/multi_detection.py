@@ -6,15 +6,55 @@ This is the main pipeline
 """
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import os
-from dataclasses import dataclass, field
+import threading
+import time
+from dataclasses import dataclass, field, fields
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
 
 import cv2
+import numpy as np
 from ultralytics import YOLO
 
+from detection_cache import CachedDetections, DetectionCache
+from refinement import cut_by_crop, native_imgsz, nms, plan_crops, refine_candidates
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v'}
+
+
+def weights_identity(model_path: str) -> str:
+    """Content hash of the weights at *model_path* (a file or an export directory).
+
+    Remote identifiers that do not exist locally hash to the identifier itself.
+    """
+    path = Path(model_path)
+    if not path.exists():
+        return model_path
+    if path.is_file():
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    digest = hashlib.sha256()
+    for file in sorted(p for p in path.rglob("*") if p.is_file()):
+        digest.update(file.relative_to(path).as_posix().encode())
+        with open(file, "rb") as f:
+            digest.update(hashlib.file_digest(f, "sha256").digest())
+    return digest.hexdigest()
+
+
+def find_video_files(videos_dir: str) -> List[Path]:
+    """List the video files directly inside *videos_dir* (sorted by name)."""
+    videos_path = Path(videos_dir)
+    if not videos_path.exists():
+        return []
+    return sorted(
+        p for p in videos_path.iterdir()
+        if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS
+    )
+
 
 @dataclass
 class Detector:
@@ -25,9 +65,22 @@ class Detector:
     target_classes: List[str] = field(default_factory=list)  # Class names to keep
     conf: float = 0.25  # Confidence threshold
     device: Optional[str] = None  # e.g. "0" for CUDA device 0
+    imgsz: Optional[int] = None  # Inference size; None keeps the model default
+
+    # Coarse-to-fine mode (enabled by setting coarse_imgsz): run the full frame at
+    # coarse_imgsz, then re-run at native resolution on crops around candidates
+    # that are below conf (but above refine_conf) or smaller than small_box_frac
+    # of the frame's short side. Candidates larger than a few small_box_frac are
+    # never refined (see refinement.REFINE_SIZE_FACTOR).
+    coarse_imgsz: Optional[int] = None
+    refine_conf: float = 0.1
+    small_box_frac: float = 0.03
+    max_crops: int = 8
+    nms_iou: float = 0.5
 
-    # Internal field (initialised in __post_init__)
+    # Internal fields (initialised in __post_init__)
     model: YOLO = field(init=False, repr=False)
+    weights_hash: str = field(init=False, repr=False)
     def __post_init__(self):
         print(f"Loading {self.name} model: {self.model_path}")
         if self.device is not None:
@@ -39,6 +92,8 @@ class Detector:
                 raise FileNotFoundError(f"Model file not found: {self.model_path}")
             
             self.model = YOLO(self.model_path, task="detect")
+            # Hashed once so a model retrained under the same name gets a new fingerprint
+            self.weights_hash = weights_identity(self.model_path)
             
             if self.device is not None:
                 self.model.to(self.device)
@@ -49,21 +104,235 @@ class Detector:
             print(f"Failed to load model '{self.model_path}': {exc}")
             raise RuntimeError(f"Failed to load model '{self.model_path}': {exc}") from exc
 
+    def fingerprint(self) -> str:
+        """Hash of the weights and settings that influence this detector's output (everything but ``device``)."""
+        config = {f.name: getattr(self, f.name) for f in fields(self) if f.init and f.name != "device"}
+        config["weights_hash"] = self.weights_hash
+        blob = json.dumps(config, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class ProcessingCancelled(Exception):
+    """Raised by ``process_video`` when its cancel event is set."""
+
+
+@dataclass(slots=True)
+class FrameDetections:
+    """Detections of one frame, stored column-wise.
+
+    ``boxes`` holds normalised, clamped ``x, y, width, height`` rows (float32),
+    ``confidences`` the matching scores and ``detector_ids`` the index of the
+    detector in ``MultiObjectDetectionProcessor.detectors`` that found each box.
+    """
+
+    frame_no: int
+    boxes: np.ndarray
+    confidences: np.ndarray
+    detector_ids: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    @classmethod
+    def from_xyxy(
+        cls,
+        frame_no: int,
+        boxes: List[np.ndarray],
+        confidences: List[np.ndarray],
+        detector_ids: List[np.ndarray],
+    ) -> "FrameDetections":
+        """Build a record from per-detector normalised xyxy arrays."""
+        if not boxes:
+            return cls(frame_no, _NO_BOXES, _NO_CONFIDENCES, _NO_DETECTOR_IDS)
+
+        xyxy = np.concatenate(boxes)
+        # Clamp to [0..1]
+        x = np.clip(xyxy[:, 0], 0.0, 1.0)
+        y = np.clip(xyxy[:, 1], 0.0, 1.0)
+        w = np.maximum(0.0, np.minimum(1.0 - x, xyxy[:, 2] - xyxy[:, 0]))
+        h = np.maximum(0.0, np.minimum(1.0 - y, xyxy[:, 3] - xyxy[:, 1]))
+        return cls(
+            frame_no,
+            np.stack([x, y, w, h], axis=1).astype(np.float32),
+            np.concatenate(confidences),
+            np.concatenate(detector_ids),
+        )
+
+
+_NO_BOXES = np.zeros((0, 4), dtype=np.float32)
+_NO_CONFIDENCES = np.zeros(0, dtype=np.float32)
+_NO_DETECTOR_IDS = np.zeros(0, dtype=np.uint8)
+for _empty in (_NO_BOXES, _NO_CONFIDENCES, _NO_DETECTOR_IDS):
+    _empty.flags.writeable = False
+
+
+@dataclass(slots=True)
+class ProgressEvent:
+    """Periodic progress report from :meth:`MultiObjectDetectionProcessor.iter_detections`."""
+
+    frames_done: int
+    frame_count: int  # As reported by the container; may be 0 or approximate
+    elapsed: float  # Seconds since the first frame was read
+
+    @property
+    def fps(self) -> float:
+        return self.frames_done / self.elapsed if self.elapsed else 0.0
+
+
+# Marks the end of the stream in aiter_detections' queue
+_END_OF_STREAM = object()
 
 
 class MultiObjectDetectionProcessor:
     """Run several YOLO detectors on a video and export a single JSON file."""
 
-    def __init__(self, detectors: List[Detector]):
+    def __init__(
+        self,
+        detectors: List[Detector],
+        cache: Optional[DetectionCache] = None,
+        detect_stride: int = 1,
+    ):
         if not detectors:
             raise ValueError("At least one Detector must be provided")
+        if detect_stride < 1:
+            raise ValueError("detect_stride must be at least 1")
         self.detectors = detectors
+        # Run the detectors on every Nth frame only; frames in between reuse the last boxes
+        self.detect_stride = detect_stride
+        # Optional frame-content cache, shared by every video this processor handles
+        self.cache = cache
+        # Detector runs that raised, across every video this processor handled
+        self.inference_failures = 0
 
     # ------------------------------------------------------------------
     # Core per-video processing
     # ------------------------------------------------------------------
-    def process_video(self, video_path: str, output_path: Optional[str] = None) -> Dict[str, Any]:
-        """Process *video_path* and (optionally) write annotations to *output_path*."""
+    def process_video(
+        self,
+        video_path: str,
+        output_path: Optional[str] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> Dict[str, Any]:
+        """Process *video_path* and (optionally) write annotations to *output_path*.
+
+        Setting *cancel* stops processing after the current frame and raises
+        :class:`ProcessingCancelled` without writing anything.
+        """
+        cap, video_info = self._open_video(video_path)
+        frame_count = video_info["frame_count"]
+        print(
+            f"Processing {video_path} — {video_info['width']}x{video_info['height']}, "
+            f"{video_info['fps']} FPS, {frame_count} frames"
+        )
+
+        data: Dict[str, Any] = {
+            "video_info": video_info,
+            "annotations": {},  # frame_number -> list[annotation]
+        }
+
+        def report(event: ProgressEvent):
+            progress = event.frames_done / frame_count * 100 if frame_count else 0
+            print(f"Progress: {progress:.1f}% ({event.frames_done}/{frame_count})")
+
+        frames_done = 0
+        detection_counts = np.zeros(len(self.detectors), dtype=np.int64)
+        if self.cache is not None:
+            hits_before, misses_before = self.cache.hits, self.cache.misses
+
+        try:
+            for record in self._detect_frames(cap, frame_count, progress=report, cancel=cancel):
+                frames_done += 1
+                if len(record):
+                    data["annotations"][record.frame_no] = self._record_to_annotations(record)
+                    detection_counts += np.bincount(record.detector_ids, minlength=len(self.detectors))
+        finally:
+            cap.release()
+
+        if cancel is not None and cancel.is_set():
+            raise ProcessingCancelled(f"Processing of {video_path} was cancelled after {frames_done} frames")
+
+        # Print detection summary
+        print(f"Detection finished: {frames_done} frames processed, detections in {len(data['annotations'])} frames")
+        for det, count in zip(self.detectors, detection_counts.tolist()):
+            print(f"  - {det.name}: {count} detections")
+
+        total_detections = sum(len(v) for v in data["annotations"].values())
+        print(f"Total annotations: {total_detections}")
+        if self.cache is not None:
+            print(
+                f"Detection cache: {self.cache.hits - hits_before} hits, "
+                f"{self.cache.misses - misses_before} misses"
+            )
+
+        if output_path:
+            self.save_annotations(data, output_path)
+
+        return data
+
+    def iter_detections(
+        self,
+        video_path: str,
+        progress: Optional[Callable[[ProgressEvent], None]] = None,
+        cancel: Optional[threading.Event] = None,
+        progress_every: int = 30,
+    ) -> Iterator[FrameDetections]:
+        """Yield a :class:`FrameDetections` for every frame of *video_path* as soon as it is done.
+
+        *progress* is called every *progress_every* frames. Setting *cancel*
+        (or closing the generator) stops processing after the current frame.
+        """
+        cap, video_info = self._open_video(video_path)
+        try:
+            yield from self._detect_frames(cap, video_info["frame_count"], progress, cancel, progress_every)
+        finally:
+            cap.release()
+
+    async def aiter_detections(
+        self,
+        video_path: str,
+        progress: Optional[Callable[[ProgressEvent], None]] = None,
+        progress_every: int = 30,
+        max_pending: int = 8,
+    ) -> AsyncIterator[FrameDetections]:
+        """Async counterpart of :meth:`iter_detections`.
+
+        Inference runs in a worker thread and up to *max_pending* frames are
+        buffered ahead of the consumer. Cancelling the consuming task or
+        leaving the ``async for`` early stops the worker after its current frame.
+        *progress* is called from the worker thread.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for record in self.iter_detections(video_path, progress, stop, progress_every):
+                    asyncio.run_coroutine_threadsafe(queue.put(record), loop).result()
+                item: Any = _END_OF_STREAM
+            except BaseException as exc:
+                item = exc
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        producer = loop.run_in_executor(None, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is _END_OF_STREAM:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            # Keep draining so a producer blocked on a full queue can exit
+            while not producer.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.wait([producer], timeout=0.05)
+
+    def _open_video(self, video_path: str) -> Tuple[cv2.VideoCapture, Dict[str, Any]]:
+        """Open *video_path*; returns the capture and the ``video_info`` block of the JSON output."""
         if not os.path.exists(video_path):
             raise FileNotFoundError(f"Video file not found: {video_path}")
 
@@ -73,136 +342,216 @@ class MultiObjectDetectionProcessor:
 
         fps = int(cap.get(cv2.CAP_PROP_FPS)) or 30  # fallback to 30 if 0
         frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        duration = frame_count / fps if fps else 0
-
-        print(f"Processing {video_path} — {width}x{height}, {fps} FPS, {frame_count} frames")
-
-        data: Dict[str, Any] = {
-            "video_info": {
-                "filename": Path(video_path).name,
-                "width": width,
-                "height": height,
-                "fps": fps,
-                "frame_count": frame_count,
-                "duration": duration,
-            },
-            "annotations": {},  # frame_number -> list[annotation]
+        video_info = {
+            "filename": Path(video_path).name,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": fps,
+            "frame_count": frame_count,
+            "duration": frame_count / fps if fps else 0,
         }
+        return cap, video_info
 
+    def _detect_frames(
+        self,
+        cap: cv2.VideoCapture,
+        frame_count: int,
+        progress: Optional[Callable[[ProgressEvent], None]] = None,
+        cancel: Optional[threading.Event] = None,
+        progress_every: int = 30,
+    ) -> Iterator[FrameDetections]:
+        """The per-frame hot loop shared by :meth:`process_video` and :meth:`iter_detections`."""
+        det_keys = [det.fingerprint() for det in self.detectors]
+        last_detections: Dict[int, CachedDetections] = {}
+        start = time.perf_counter()
         frame_no = 0
-        processed_frames = 0
-        detection_counts = {det.name: 0 for det in self.detectors}
 
-        while True:
+        while cancel is None or not cancel.is_set():
             ok, frame = cap.read()
             if not ok:
                 break
 
-            frame_anns: List[Dict[str, Any]] = []
+            run_detectors = frame_no % self.detect_stride == 0
+            frame_key = self.cache.hash_frame(frame) if run_detectors and self.cache is not None else None
 
             # ----------------------------------------------------------
-            # Run every detector on the current frame
+            # Run every detector on the current frame (or reuse cached boxes)
             # ----------------------------------------------------------
-            for det in self.detectors:
-                try:
-                    results = det.model(frame, conf=det.conf, verbose=False)
-                except Exception as exc:
-                    print(f"[WARN] {det.name}: error on frame {frame_no}: {exc}")
-                    continue
-
-                if not results:
-                    continue
-
-                for res in results:
-                    boxes = getattr(res, "boxes", None)
-                    if boxes is None or len(boxes) == 0:
+            frame_boxes: List[np.ndarray] = []
+            frame_confs: List[np.ndarray] = []
+            frame_ids: List[np.ndarray] = []
+            for det_id, det in enumerate(self.detectors):
+                if not run_detectors:
+                    detections = last_detections.get(det_id)
+                    if detections is None:
                         continue
+                else:
+                    cache_key = (frame_key, det_keys[det_id]) if frame_key is not None else None
+                    detections = self.cache.get(cache_key) if cache_key is not None else None
+                    if detections is None:
+                        detections = self._run_detector(det, frame, frame_no)
+                        if detections is None:
+                            last_detections.pop(det_id, None)
+                            continue
+                        if cache_key is not None:
+                            self.cache.put(cache_key, detections)
+                    last_detections[det_id] = detections
+
+                boxes, confs = detections
+                if len(boxes):
+                    frame_boxes.append(boxes)
+                    frame_confs.append(confs)
+                    frame_ids.append(np.full(len(boxes), det_id, dtype=np.uint8))
 
-                    xyxy = boxes.xyxy.cpu().numpy()
-                    confs = boxes.conf.cpu().numpy() if hasattr(boxes, "conf") else []
-                    cls_idx = boxes.cls.cpu().numpy() if hasattr(boxes, "cls") else None
-
-                    # Debug: Print available class names for this detector (only first frame)
-                    if frame_no == 0 and hasattr(res, "names"):
-                        available_classes = {idx: name for idx, name in res.names.items()}
-                        # print(f"[DEBUG] {det.name} model classes: {available_classes}")
-                    for i, box in enumerate(xyxy):
-                        # Get detected class info
-                        detected_class_name = det.name  # fallback to detector name
-                        
-                        if cls_idx is not None and hasattr(res, "names"):
-                            detected_class_id = int(cls_idx[i])
-                            detected_class_name = res.names.get(detected_class_id, f"class_{detected_class_id}")
-                            
-                            # # Debug: Print detected class (first few detections per detector)
-                            # if detection_counts[det.name] < 5:
-                            #     # print(f"[DEBUG] {det.name} detected class ID {detected_class_id}: '{detected_class_name}'")
-                        
-                        # For license plate detector, we already know it's detecting 'License_Plate' class
-                        # Since we set target_classes=[] in main.py, we accept all detections
-                        if det.target_classes:
-                            # Only filter if target_classes is not empty
-                            if detected_class_name not in det.target_classes:
-                                continue
-                        
-                        # If we get here, we want to include this detection
-                        x1, y1, x2, y2 = box[:4]
-                        confidence = float(confs[i]) if i < len(confs) else 0.0
-
-                        # Normalise [0..1]
-                        x = float(max(0.0, min(1.0, x1 / width)))
-                        y = float(max(0.0, min(1.0, y1 / height)))
-                        w_norm = float(max(0.0, min(1.0 - x, (x2 - x1) / width)))
-                        h_norm = float(max(0.0, min(1.0 - y, (y2 - y1) / height)))
-
-                        frame_anns.append(
-                            {
-                                "id": f"{det.name}_{frame_no}_{len(frame_anns)}",
-                                "x": x,
-                                "y": y,
-                                "width": w_norm,
-                                "height": h_norm,
-                                "confidence": confidence,
-                                "type": "ai-generated",
-                                "class": det.name,  # Use detector name for the class field
-                            }
-                        )
-                        detection_counts[det.name] += 1
-            if frame_anns:
-                data["annotations"][frame_no] = frame_anns
-                processed_frames += 1
+            yield FrameDetections.from_xyxy(frame_no, frame_boxes, frame_confs, frame_ids)
 
             frame_no += 1
-            if frame_no % 30 == 0:
-                progress = frame_no / frame_count * 100 if frame_count else 0
-                print(f"Progress: {progress:.1f}% ({frame_no}/{frame_count})")
+            if progress is not None and frame_no % progress_every == 0:
+                progress(ProgressEvent(frame_no, frame_count, time.perf_counter() - start))
 
-        cap.release()
-        
-        # Print detection summary
-        print(f"Detection finished: {frame_no} frames processed, detections in {processed_frames} frames")
-        for det_name, count in detection_counts.items():
-            print(f"  - {det_name}: {count} detections")
-        
-        total_detections = sum(len(v) for v in data["annotations"].values())
-        print(f"Total annotations: {total_detections}")
+    def _record_to_annotations(self, record: FrameDetections) -> List[Dict[str, Any]]:
+        """Expand a record into the annotation dicts stored in the JSON output."""
+        anns = []
+        for i, ((x, y, w, h), confidence, det_id) in enumerate(
+            zip(record.boxes.tolist(), record.confidences.tolist(), record.detector_ids.tolist())
+        ):
+            name = self.detectors[det_id].name
+            anns.append(
+                {
+                    "id": f"{name}_{record.frame_no}_{i}",
+                    "x": x,
+                    "y": y,
+                    "width": w,
+                    "height": h,
+                    "confidence": confidence,
+                    "type": "ai-generated",
+                    "class": name,  # Use detector name for the class field
+                }
+            )
+        return anns
 
-        if output_path:
-            self._save_annotations(data, output_path)
+    def _run_detector(self, det: Detector, frame: np.ndarray, frame_no: int) -> Optional[CachedDetections]:
+        """Run *det* on *frame* and return its kept boxes (normalised xyxy) and confidences.
 
-        return data
-    def _save_annotations(self, annotations: Dict[str, Any], output_path: str):
-        """Save annotations to a JSON file."""
+        Returns None if inference failed, so the result is not cached.
+        """
+        height, width = frame.shape[:2]
+        try:
+            if det.coarse_imgsz:
+                xyxy, confs = self._predict_coarse_to_fine(det, frame)
+            else:
+                xyxy, confs = self._predict(det, frame, det.conf, det.imgsz)
+        except Exception as exc:
+            print(f"[WARN] {det.name}: error on frame {frame_no}: {exc}")
+            self.inference_failures += 1
+            return None
+
+        return xyxy / np.array([width, height, width, height], dtype=np.float32), confs
+
+    def _predict(
+        self, det: Detector, image: np.ndarray, conf: float, imgsz: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Run *det*'s model once; returns pixel xyxy boxes and confidences of the target classes."""
+        kwargs: Dict[str, Any] = {"conf": conf, "verbose": False}
+        if imgsz:
+            kwargs["imgsz"] = imgsz
+        results = det.model(image, **kwargs)
+
+        kept_boxes: List[np.ndarray] = []
+        kept_confs: List[np.ndarray] = []
+        for res in results or []:
+            boxes = getattr(res, "boxes", None)
+            if boxes is None or len(boxes) == 0:
+                continue
+
+            xyxy = boxes.xyxy.cpu().numpy()[:, :4]
+            confs = boxes.conf.cpu().numpy() if hasattr(boxes, "conf") else np.zeros(len(xyxy))
+            cls_idx = boxes.cls.cpu().numpy() if hasattr(boxes, "cls") else None
+
+            # An empty target_classes list means accept all classes (e.g. the license plate model)
+            if det.target_classes and cls_idx is not None and hasattr(res, "names"):
+                keep = np.array(
+                    [res.names.get(int(c), f"class_{int(c)}") in det.target_classes for c in cls_idx],
+                    dtype=bool,
+                )
+                xyxy, confs = xyxy[keep], confs[keep]
+
+            kept_boxes.append(xyxy)
+            kept_confs.append(confs)
+
+        if not kept_boxes:
+            return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32)
+        return (
+            np.concatenate(kept_boxes).astype(np.float32),
+            np.concatenate(kept_confs).astype(np.float32),
+        )
+
+    def _predict_coarse_to_fine(self, det: Detector, frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Low-resolution pass on the full frame, native-resolution passes on uncertain regions."""
+        height, width = frame.shape[:2]
+        boxes, confs = self._predict(det, frame, min(det.refine_conf, det.conf), det.coarse_imgsz)
+
+        uncertain = refine_candidates(boxes, confs, det.conf, det.small_box_frac, width, height)
+
+        # Confident coarse boxes are kept as-is; uncertain ones only survive if a crop confirms them
+        confident = confs >= det.conf
+        merged_boxes = [boxes[confident]]
+        merged_confs = [confs[confident]]
+        for crop in plan_crops(boxes[uncertain], confs[uncertain], width, height, det.max_crops):
+            x1, y1, x2, y2 = crop
+            crop_boxes, crop_confs = self._predict(det, frame[y1:y2, x1:x2], det.conf, native_imgsz(crop))
+            # Drop objects cut off by the crop border, they would survive NMS as partial duplicates
+            keep = ~cut_by_crop(crop_boxes, crop, width, height)
+            crop_boxes, crop_confs = crop_boxes[keep], crop_confs[keep]
+            merged_boxes.append(crop_boxes + np.array([x1, y1, x1, y1], dtype=np.float32))
+            merged_confs.append(crop_confs)
+
+        boxes = np.concatenate(merged_boxes)
+        confs = np.concatenate(merged_confs)
+        keep = nms(boxes, confs, det.nms_iou)
+        return boxes[keep], confs[keep]
+
+    def process_sample_videos(self, videos_dir: str = "videos", output_dir: str = "assets-json"):
+        """Process every video in *videos_dir* and write one JSON file per video to *output_dir*."""
+        video_files = find_video_files(videos_dir)
+        if not video_files:
+            print(f"No video files found in {videos_dir}")
+            return
+
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        for video_file in video_files:
+            print(f"\n{'='*50}")
+            output_file = Path(output_dir) / f"{video_file.stem}_annotations.json"
+            try:
+                self.process_video(str(video_file), str(output_file))
+            except Exception as e:
+                print(f"Error processing {video_file}: {e}")
+                continue
+
+        print(f"\n{'='*50}")
+        print("Batch processing completed!")
+
+    def save_annotations(self, annotations: Dict[str, Any], output_path: str, raise_errors: bool = False):
+        """Save annotations to a JSON file.
+
+        The file is written next to *output_path* and moved into place, so a
+        failed write never leaves a truncated file behind. Errors are printed,
+        or re-raised when *raise_errors* is set.
+        """
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
         try:
             # Create output directory if it doesn't exist
             output_dir = os.path.dirname(output_path)
             if output_dir:
                 os.makedirs(output_dir, exist_ok=True)
             
-            with open(output_path, 'w') as f:
+            with open(tmp_path, 'w') as f:
                 json.dump(annotations, f, indent=2)
+            os.replace(tmp_path, output_path)
             print(f"Annotations saved to: {output_path}")
         except Exception as e:
-            print(f"Error saving annotations: {e}")
\ No newline at end of file
+            print(f"Error saving annotations: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if raise_errors:
+                raise
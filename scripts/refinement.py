@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Helpers for coarse-to-fine detection
+
+A detector can run at a low input size on the whole frame and then re-run at
+native resolution on crops around candidates it was unsure about (low
+confidence or very small boxes). These helpers pick the crops and merge the
+coarse and refined boxes back together.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+# A crop is the candidate box grown by this many box sides on every edge
+CROP_CONTEXT = 1.0
+# Never crop smaller than this, so YOLO still sees some surroundings
+MIN_CROP_SIZE = 640
+# YOLO input sizes must be multiples of the model stride
+STRIDE = 32
+# Boxes this close (in pixels) to an inner crop edge count as cut off by it
+EDGE_MARGIN = 2
+# Only boxes under this many times the small-box size are refined; larger ones
+# already span enough coarse pixels that a native crop costs far more than it adds
+REFINE_SIZE_FACTOR = 4
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float = 0.5) -> np.ndarray:
+    """Greedy non-maximum suppression; returns indices of the kept boxes, best first."""
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = np.maximum(0.0, x2 - x1) * np.maximum(0.0, y2 - y1)
+    order = np.argsort(-scores, kind="stable")
+
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        iw = np.maximum(0.0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        ih = np.maximum(0.0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        inter = iw * ih
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def refine_candidates(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    conf: float,
+    small_box_frac: float,
+    frame_width: int,
+    frame_height: int,
+) -> np.ndarray:
+    """Mask of coarse *boxes* worth re-running at native resolution.
+
+    A box qualifies if it is below *conf* or smaller than *small_box_frac* of
+    the frame's short side, and in both cases only while it is smaller than
+    ``REFINE_SIZE_FACTOR`` times that size.
+    """
+    small_side = small_box_frac * min(frame_width, frame_height)
+    sides = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+    uncertain = (scores < conf) | (sides < small_side)
+    return uncertain & (sides < REFINE_SIZE_FACTOR * small_side)
+
+
+def plan_crops(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    frame_width: int,
+    frame_height: int,
+    max_crops: int = 8,
+) -> np.ndarray:
+    """Choose up to *max_crops* integer xyxy crop windows covering the candidate *boxes*.
+
+    Candidates are visited from most to least confident; a candidate already
+    fully inside a chosen crop does not get its own.
+    """
+    crops = []
+    for i in np.argsort(-scores, kind="stable"):
+        if len(crops) >= max_crops:
+            break
+        bx1, by1, bx2, by2 = boxes[i]
+        if any(cx1 <= bx1 and cy1 <= by1 and bx2 <= cx2 and by2 <= cy2 for cx1, cy1, cx2, cy2 in crops):
+            continue
+
+        side = max(bx2 - bx1, by2 - by1) * (1 + 2 * CROP_CONTEXT)
+        side = min(max(side, MIN_CROP_SIZE), frame_width, frame_height)
+        cx, cy = (bx1 + bx2) / 2, (by1 + by2) / 2
+        x1 = int(min(max(cx - side / 2, 0), frame_width - side))
+        y1 = int(min(max(cy - side / 2, 0), frame_height - side))
+        crops.append((x1, y1, int(x1 + side), int(y1 + side)))
+
+    return np.array(crops, dtype=np.int64).reshape(-1, 4)
+
+
+def native_imgsz(crop: np.ndarray) -> int:
+    """Input size that runs *crop* at (about) its native resolution."""
+    side = int(max(crop[2] - crop[0], crop[3] - crop[1]))
+    return max(STRIDE, -(-side // STRIDE) * STRIDE)
+
+
+def cut_by_crop(crop_boxes: np.ndarray, crop: np.ndarray, frame_width: int, frame_height: int) -> np.ndarray:
+    """Mask of *crop_boxes* (crop coordinates) touching a crop edge that is not also a frame edge.
+
+    Such boxes are likely an object truncated by the crop; the coarse pass or
+    a neighbouring crop is a better source for them.
+    """
+    x1, y1, x2, y2 = (int(v) for v in crop)
+    width, height = x2 - x1, y2 - y1
+    cut = np.zeros(len(crop_boxes), dtype=bool)
+    if x1 > 0:
+        cut |= crop_boxes[:, 0] <= EDGE_MARGIN
+    if y1 > 0:
+        cut |= crop_boxes[:, 1] <= EDGE_MARGIN
+    if x2 < frame_width:
+        cut |= crop_boxes[:, 2] >= width - EDGE_MARGIN
+    if y2 < frame_height:
+        cut |= crop_boxes[:, 3] >= height - EDGE_MARGIN
+    return cut
@@ -0,0 +1,92 @@
+import numpy as np
+
+from detection_cache import DetectionCache, frame_hash
+
+
+def _frame(seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 176, (2160, 3840, 3), dtype=np.uint8)
+
+
+def test_small_object_changes_the_key():
+    base = _frame()
+    with_plate = base.copy()
+    with_plate[1200:1215, 2000:2040] += 80  # 40x15 px plate in a 4K frame
+
+    assert frame_hash(with_plate) != frame_hash(base)
+
+
+def test_small_change_misses_the_cache():
+    cache = DetectionCache(max_entries=4)
+    base = _frame()
+    boxes = np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32)
+    cache.put((cache.hash_frame(base), "det"), boxes)
+
+    changed = base.copy()
+    changed[500:503, 700:703] += 30
+    assert cache.get((cache.hash_frame(changed), "det")) is None
+    assert cache.get((cache.hash_frame(base.copy()), "det")) is not None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_near_duplicate_matching_is_opt_in():
+    base = np.full((720, 1280, 3), 100, dtype=np.uint8)
+    noisy = base + np.random.default_rng(1).integers(0, 2, base.shape, dtype=np.uint8)
+
+    assert frame_hash(noisy) != frame_hash(base)
+    assert frame_hash(noisy, quant_bits=4) == frame_hash(base, quant_bits=4)
+
+
+def test_aspect_ratio_is_part_of_the_key():
+    assert frame_hash(np.zeros((720, 1280, 3), np.uint8)) != frame_hash(np.zeros((1280, 720, 3), np.uint8))
+
+
+def test_lru_eviction():
+    cache = DetectionCache(max_entries=2)
+    entry = np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32)
+    cache.put((b"a", "det"), entry)
+    cache.put((b"b", "det"), entry)
+    cache.get((b"a", "det"))
+    cache.put((b"c", "det"), entry)
+
+    assert cache.get((b"b", "det")) is None
+    assert cache.get((b"a", "det")) is not None
+    assert cache.evictions == 1
+
+
+def test_save_and_load_round_trip(tmp_path):
+    cache = DetectionCache(max_entries=4)
+    boxes = np.array([[0.1, 0.2, 0.3, 0.4], [0.5, 0.5, 0.6, 0.7]], dtype=np.float32)
+    confs = np.array([0.9, 0.4], dtype=np.float32)
+    empty = np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32)
+    cache.put((frame_hash(_frame(1)), "face"), (boxes, confs))
+    cache.put((frame_hash(_frame(2)), "plate"), empty)
+
+    path = str(tmp_path / "cache.npz")
+    cache.save(path)
+    loaded = DetectionCache(max_entries=4, path=path)
+
+    assert len(loaded) == 2
+    got_boxes, got_confs = loaded.get((frame_hash(_frame(1)), "face"))
+    np.testing.assert_array_equal(got_boxes, boxes)
+    np.testing.assert_array_equal(got_confs, confs)
+    assert len(loaded.get((frame_hash(_frame(2)), "plate"))[0]) == 0
+
+
+def test_load_rejects_pickled_files(tmp_path):
+    path = tmp_path / "cache.npz"
+    np.save(path, np.array([object()], dtype=object), allow_pickle=True)
+
+    assert len(DetectionCache(path=str(path))) == 0
+
+
+def test_round_trip_keeps_keys_ending_in_nul(tmp_path):
+    cache = DetectionCache()
+    entry = np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32)
+    key = (b"\x01" * 15 + b"\x00", "face")
+    cache.put(key, entry)
+
+    path = str(tmp_path / "cache.npz")
+    cache.save(path)
+
+    assert DetectionCache(path=path).get(key) is not None
@@ -0,0 +1,146 @@
+import shutil
+import sqlite3
+import time
+
+import job_queue
+from job_queue import DONE, FAILED, PENDING, JobQueue, run_worker, settings_fingerprint
+
+
+class StubDetector:
+    def __init__(self, key):
+        self.key = key
+
+    def fingerprint(self):
+        return self.key
+
+
+class StubProcessor:
+    """Records processed videos; optionally runs a hook while "processing"."""
+
+    def __init__(self, key="A", during=None):
+        self.detectors = [StubDetector(key)]
+        self.detect_stride = 1
+        self.during = during
+        self.processed = []
+        self.saved = []
+
+    def process_video(self, video_path, cancel=None):
+        self.processed.append(video_path)
+        if self.during is not None:
+            self.during()
+        return {"video_info": {}, "annotations": {}}
+
+    def save_annotations(self, data, output_path, raise_errors=False):
+        self.saved.append(output_path)
+
+
+def _video(tmp_path, name="a.mp4", content=b"video"):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_claim_only_takes_jobs_for_own_settings(tmp_path):
+    queue = JobQueue(str(tmp_path / "q.sqlite"))
+    queue.enqueue(_video(tmp_path), "settings-a")
+
+    assert queue.claim("w1", "settings-b") is None
+    job = queue.claim("w1", "settings-a")
+    assert job is not None and job.settings_hash == "settings-a"
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    queue = JobQueue(str(tmp_path / "q.sqlite"), lease_seconds=0.01)
+    queue.enqueue(_video(tmp_path), "s")
+    first = queue.claim("w1", "s")
+    time.sleep(0.05)
+    second = queue.claim("w2", "s")
+
+    assert second is not None and second.id == first.id
+    assert second.attempts == 2
+    assert queue.heartbeat(first, "w1") is False
+    assert queue.complete(first, "w1") is False
+    assert queue.heartbeat(second, "w2") is True
+
+
+def test_running_job_is_not_claimed_twice(tmp_path):
+    queue = JobQueue(str(tmp_path / "q.sqlite"), lease_seconds=60)
+    queue.enqueue(_video(tmp_path), "s")
+
+    assert queue.claim("w1", "s") is not None
+    assert queue.claim("w2", "s") is None
+
+
+def test_max_attempts_ends_in_failed(tmp_path):
+    queue = JobQueue(str(tmp_path / "q.sqlite"), max_attempts=2)
+    queue.enqueue(_video(tmp_path), "s")
+
+    for _ in range(2):
+        job = queue.claim("w", "s")
+        assert queue.fail(job, "w", "boom")
+
+    assert queue.claim("w", "s") is None
+    assert queue.counts()[FAILED] == 1
+
+    assert queue.retry_failed("s") == 1
+    assert queue.counts()[PENDING] == 1
+    assert queue.claim("w", "s").attempts == 1
+
+
+def test_copied_or_renamed_content_reuses_the_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "q.sqlite"))
+    original = _video(tmp_path)
+    job_id, created = queue.enqueue(original, "s")
+    assert created
+
+    copy = str(tmp_path / "copy.mp4")
+    shutil.copy(original, copy)
+    renamed = str(tmp_path / "renamed.mp4")
+    shutil.move(original, renamed)
+
+    assert queue.enqueue(copy, "s") == (job_id, False)
+    assert queue.enqueue(renamed, "s") == (job_id, False)
+    assert queue.enqueue(copy, "other-settings")[1] is True
+
+
+def test_unchanged_files_are_not_rehashed(tmp_path, monkeypatch):
+    queue = JobQueue(str(tmp_path / "q.sqlite"))
+    video = _video(tmp_path)
+    hashed = []
+    real_hash = job_queue.file_content_hash
+    monkeypatch.setattr(job_queue, "file_content_hash", lambda p: hashed.append(p) or real_hash(p))
+
+    queue.enqueue(video, "s")
+    queue.enqueue(video, "t")
+    assert len(hashed) == 1
+
+    _video(tmp_path, content=b"changed video")
+    queue.enqueue(video, "s")
+    assert len(hashed) == 2
+
+
+def test_run_worker_completes_jobs(tmp_path):
+    queue = JobQueue(str(tmp_path / "q.sqlite"))
+    processor = StubProcessor()
+    queue.enqueue(_video(tmp_path), settings_fingerprint(processor))
+
+    assert run_worker(queue, processor, str(tmp_path / "out"), "w") == 1
+    assert processor.saved == [str(tmp_path / "out" / "a_annotations.json")]
+    assert queue.jobs()[0]["status"] == DONE
+
+
+def test_run_worker_discards_result_after_lost_lease(tmp_path):
+    db_path = str(tmp_path / "q.sqlite")
+    queue = JobQueue(db_path)
+
+    def steal_lease():
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("UPDATE jobs SET worker_id = 'other', lease_expires = ?", (time.time() + 60,))
+
+    processor = StubProcessor(during=steal_lease)
+    queue.enqueue(_video(tmp_path), settings_fingerprint(processor))
+
+    assert run_worker(queue, processor, str(tmp_path / "out"), "w") == 0
+    assert processor.processed and not processor.saved
+    job = queue.jobs()[0]
+    assert job["status"] == "running" and job["worker_id"] == "other"
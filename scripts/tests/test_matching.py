@@ -0,0 +1,48 @@
+import json
+from pathlib import Path
+
+from matching import annotations_to_arrays, count_matches
+
+CLASS_IDS = {"face": 0, "license_plate": 1}
+REFERENCE = Path(__file__).resolve().parents[2] / "assets-json" / "face_license_test_annotations.json"
+
+
+def _ann(x1, y1, x2, y2, cls="face"):
+    return {"x": x1, "y": y1, "width": x2 - x1, "height": y2 - y1, "class": cls}
+
+
+def _arrays(boxes, cls="face"):
+    return annotations_to_arrays({0: [_ann(*b, cls=cls) for b in boxes]}, CLASS_IDS)
+
+
+def test_overlapping_boxes_fall_back_to_second_best_match():
+    gt = _arrays([(0, 0, 1, 1), (0.4, 0, 1.4, 1)])
+    pred = _arrays([(0, 0, 1, 1), (0.15, 0, 1.15, 1)])
+
+    # The second prediction's best box is taken by the exact match, but it
+    # still clears IoU 0.5 with the other ground-truth box
+    assert count_matches(pred, gt, 0.5) == 2
+
+
+def test_each_box_is_matched_at_most_once():
+    gt = _arrays([(0, 0, 1, 1)])
+    pred = _arrays([(0, 0, 1, 1), (0.05, 0, 1.05, 1)])
+
+    assert count_matches(pred, gt, 0.5) == 1
+    assert count_matches(gt, pred, 0.5) == 1
+
+
+def test_classes_must_agree_unless_unknown():
+    gt = _arrays([(0, 0, 1, 1)], cls="face")
+    plate = _arrays([(0, 0, 1, 1)], cls="license_plate")
+    manual = _arrays([(0, 0, 1, 1)], cls="manual")
+
+    assert count_matches(plate, gt) == 0
+    assert count_matches(plate, manual) == 1
+
+
+def test_reference_file_matches_itself():
+    reference = json.loads(REFERENCE.read_text())["annotations"]
+    gt = annotations_to_arrays(reference, CLASS_IDS)
+
+    assert count_matches(gt, gt) == len(gt[0])
@@ -0,0 +1,44 @@
+import numpy as np
+
+from refinement import MIN_CROP_SIZE, cut_by_crop, nms, plan_crops, refine_candidates
+
+
+def test_nms_keeps_best_of_overlapping_boxes():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [50, 50, 60, 60]], dtype=np.float32)
+    scores = np.array([0.8, 0.9, 0.7], dtype=np.float32)
+
+    assert nms(boxes, scores, 0.5).tolist() == [1, 2]
+
+
+def test_plan_crops_stays_inside_frame():
+    boxes = np.array([[3800, 2100, 3830, 2150]], dtype=np.float32)
+    crops = plan_crops(boxes, np.array([0.3]), 3840, 2160)
+
+    assert crops.tolist() == [[3200, 1520, 3840, 2160]]
+
+
+def test_cut_by_crop_ignores_frame_edges():
+    # Crop touching the right and bottom frame edges
+    crop = np.array([3200, 1520, 3840, 2160])
+    boxes = np.array(
+        [
+            [0, 100, 50, 150],  # cut by the inner left edge
+            [100, 0, 150, 40],  # cut by the inner top edge
+            [600, 600, 640, 640],  # at the frame corner, complete
+            [200, 200, 260, 240],  # well inside
+        ],
+        dtype=np.float32,
+    )
+
+    assert cut_by_crop(boxes, crop, 3840, 2160).tolist() == [True, True, False, False]
+
+
+def test_large_low_confidence_box_is_not_refined():
+    # 4K frame: an 800px face at low confidence next to a 40px one
+    boxes = np.array([[1000, 600, 1800, 1400], [3000, 500, 3040, 540]], dtype=np.float32)
+    scores = np.array([0.2, 0.2], dtype=np.float32)
+    candidates = refine_candidates(boxes, scores, 0.25, 0.03, 3840, 2160)
+    crops = plan_crops(boxes[candidates], scores[candidates], 3840, 2160)
+
+    assert candidates.tolist() == [False, True]
+    assert (crops[:, 2] - crops[:, 0]).max() == MIN_CROP_SIZE
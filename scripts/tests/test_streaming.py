@@ -0,0 +1,128 @@
+import asyncio
+import sys
+import threading
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+try:
+    import ultralytics  # noqa: F401
+except ImportError:
+    # multi_detection imports YOLO at module level; the tests swap in StubYOLO anyway
+    sys.modules["ultralytics"] = types.SimpleNamespace(YOLO=None)
+
+import multi_detection
+from multi_detection import Detector, MultiObjectDetectionProcessor, ProcessingCancelled
+
+WIDTH, HEIGHT = 64, 48
+
+
+class _Array:
+    """Minimal stand-in for a torch tensor."""
+
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype=np.float32)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+
+class _Boxes:
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy, self.conf, self.cls = _Array(xyxy), _Array(conf), _Array(cls)
+
+    def __len__(self):
+        return len(self.xyxy.values)
+
+
+class StubYOLO:
+    """Finds one "face" whose position follows the frame's brightness."""
+
+    calls = 0
+
+    def __init__(self, model_path, task=None):
+        pass
+
+    def __call__(self, image, **kwargs):
+        StubYOLO.calls += 1
+        x = float(image.mean()) / 255 * (WIDTH - 10)
+        boxes = _Boxes([[x, 5, x + 10, 15]], [0.9], [0])
+        return [types.SimpleNamespace(boxes=boxes, names={0: "face"})]
+
+
+@pytest.fixture
+def processor(monkeypatch):
+    monkeypatch.setattr(multi_detection, "YOLO", StubYOLO)
+    StubYOLO.calls = 0
+    detector = Detector(name="face", model_path="stub-model", target_classes=["face"])
+    return MultiObjectDetectionProcessor([detector])
+
+
+def _video(tmp_path, frames=25):
+    path = str(tmp_path / "clip.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 25, (WIDTH, HEIGHT))
+    for i in range(frames):
+        writer.write(np.full((HEIGHT, WIDTH, 3), i * 4, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def test_process_video_matches_iter_detections(processor, tmp_path):
+    video = _video(tmp_path)
+    processor.detect_stride = 3
+
+    data = processor.process_video(video)
+    assert StubYOLO.calls == 9  # frames 0, 3, ..., 24
+
+    records = list(processor.iter_detections(video))
+    streamed = {r.frame_no: processor._record_to_annotations(r) for r in records if len(r)}
+    assert len(records) == 25
+    assert streamed == data["annotations"]
+
+
+def test_cancel_raises_processing_cancelled(processor, tmp_path):
+    video = _video(tmp_path)
+    cancel = threading.Event()
+    run_detector = processor._run_detector
+
+    def run_and_cancel(det, frame, frame_no):
+        if frame_no == 9:
+            cancel.set()
+        return run_detector(det, frame, frame_no)
+
+    processor._run_detector = run_and_cancel
+    with pytest.raises(ProcessingCancelled):
+        processor.process_video(video, cancel=cancel)
+    assert StubYOLO.calls == 10
+
+
+def test_leaving_async_for_early_stops_the_producer(processor, tmp_path):
+    video = _video(tmp_path, frames=60)
+
+    async def consume():
+        seen = []
+        async for record in processor.aiter_detections(video, max_pending=1):
+            seen.append(record.frame_no)
+            if len(seen) == 2:
+                break
+        return seen
+
+    assert asyncio.run(consume()) == [0, 1]
+    # asyncio.run has closed the generator and joined the worker thread
+    assert StubYOLO.calls < 10
+    assert not any(t.name.startswith("asyncio_") for t in threading.enumerate())
+
+
+def test_progress_fires_every_progress_every_frames(processor, tmp_path):
+    video = _video(tmp_path)
+    events = []
+
+    records = list(processor.iter_detections(video, progress=events.append, progress_every=10))
+
+    assert len(records) == 25
+    assert [(e.frames_done, e.frame_count) for e in events] == [(10, 25), (20, 25)]
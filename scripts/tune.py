@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Speed/accuracy tuner for the multi-object detection pipeline
+
+Sweeps MultiObjectDetectionProcessor settings (confidence, input size,
+coarse-to-fine size, detect stride, model backend) on one video, scores each
+configuration against a reference annotations file in the usual JSON format
+and writes the fastest configuration that meets a recall floor as a config
+file for `main.py --config`.
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Add current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Change to project root directory (parent of scripts directory)
+project_root = Path(__file__).parent.parent
+os.chdir(project_root)
+
+from matching import annotations_to_arrays, count_matches
+from multi_detection import Detector, MultiObjectDetectionProcessor
+
+
+@dataclass
+class TrialResult:
+    """Outcome of running one configuration."""
+
+    config: Dict[str, Any]
+    fps: float
+    recall: float
+    precision: float
+    true_positives: int
+    predictions: int
+    ground_truth: int
+    failures: int = 0  # Detector runs that raised; such a trial is not scored
+
+
+# ----------------------------------------------------------------------
+# Scoring
+# ----------------------------------------------------------------------
+def pareto_front(results: List[TrialResult]) -> List[TrialResult]:
+    """Results not dominated on (fps, recall, precision)."""
+    scores = np.array([(r.fps, r.recall, r.precision) for r in results], dtype=np.float64).reshape(-1, 3)
+    at_least = (scores[:, None, :] >= scores[None, :, :]).all(axis=2)
+    better = (scores[:, None, :] > scores[None, :, :]).any(axis=2)
+    dominated = (at_least & better).any(axis=0)
+    return [r for r, d in zip(results, dominated) if not d]
+
+
+def recommend(results: List[TrialResult], min_recall: float, min_precision: float) -> TrialResult:
+    """Fastest result meeting both floors, or the most accurate one if none does."""
+    eligible = [r for r in results if r.recall >= min_recall and r.precision >= min_precision]
+    if eligible:
+        return max(eligible, key=lambda r: r.fps)
+    print(f"[WARN] No configuration reaches recall {min_recall} / precision {min_precision}; "
+          "recommending the one with the best recall")
+    return max(results, key=lambda r: (r.recall, r.precision, r.fps))
+
+
+# ----------------------------------------------------------------------
+# Sweep
+# ----------------------------------------------------------------------
+def parse_list(value: str, cast=float) -> List[Any]:
+    """Parse ``"a,b,c"``; ``default``/``off``/``none`` become None."""
+    items = []
+    for item in value.split(","):
+        item = item.strip()
+        items.append(None if item.lower() in {"default", "off", "none"} else cast(item))
+    return items
+
+
+# Where `yolo export format=<backend>` puts the model, relative to the .pt file's stem
+BACKEND_EXPORTS = {
+    "pt": "{stem}.pt",
+    "torchscript": "{stem}.torchscript",
+    "onnx": "{stem}.onnx",
+    "engine": "{stem}.engine",
+    "coreml": "{stem}.mlpackage",
+    "mnn": "{stem}.mnn",
+    "openvino": "{stem}_openvino_model",
+    "saved_model": "{stem}_saved_model",
+    "paddle": "{stem}_paddle_model",
+    "ncnn": "{stem}_ncnn_model",
+}
+
+
+def backend_model_path(model_path: str, backend: str) -> str:
+    """Path of the *backend* export of *model_path* (e.g. ``openvino`` -> ``model_openvino_model/``)."""
+    if backend == "pt":
+        return model_path
+    path = Path(model_path)
+    return str(path.with_name(BACKEND_EXPORTS[backend].format(stem=path.stem)))
+
+
+def build_detectors(args: argparse.Namespace, backend: str) -> Optional[List[Detector]]:
+    face_model = backend_model_path(args.face_model, backend)
+    license_model = backend_model_path(args.license_model, backend)
+    for path in (face_model, license_model):
+        if backend != "pt" and not Path(path).exists():
+            print(f"[WARN] Skipping backend '{backend}': {path} not found")
+            return None
+
+    detectors = [
+        Detector(name="face", model_path=face_model, target_classes=["face"], device=args.device),
+        Detector(name="license_plate", model_path=license_model, target_classes=[], device=args.device),
+    ]
+    return detectors
+
+
+def run_trial(
+    detectors: List[Detector],
+    config: Dict[str, Any],
+    video: str,
+    gt: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    class_ids: Dict[str, int],
+    iou_threshold: float,
+    verbose: bool,
+) -> TrialResult:
+    # Models stay loaded across trials, so only the settings are swapped in
+    for det in detectors:
+        det.conf = config["confidence"]
+        det.imgsz = config["imgsz"]
+        det.coarse_imgsz = config["coarse_imgsz"]
+    processor = MultiObjectDetectionProcessor(detectors, detect_stride=config["detect_stride"])
+
+    log = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with log:
+        start = time.perf_counter()
+        data = processor.process_video(video)
+        elapsed = time.perf_counter() - start
+
+    pred = annotations_to_arrays(data["annotations"], class_ids)
+    tp = count_matches(pred, gt, iou_threshold)
+    n_pred, n_gt = len(pred[0]), len(gt[0])
+    return TrialResult(
+        config=config,
+        fps=data["video_info"]["frame_count"] / elapsed if elapsed else 0.0,
+        recall=tp / n_gt if n_gt else 1.0,
+        precision=tp / n_pred if n_pred else 1.0,
+        true_positives=tp,
+        predictions=n_pred,
+        ground_truth=n_gt,
+        failures=processor.inference_failures,
+    )
+
+
+def format_config(config: Dict[str, Any]) -> str:
+    return (
+        f"backend={config['backend']:<6} conf={config['confidence']:<5} "
+        f"imgsz={config['imgsz'] or 'default'!s:<7} coarse={config['coarse_imgsz'] or 'off'!s:<5} "
+        f"stride={config['detect_stride']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sweep detection settings against reference annotations and recommend a config",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Tune on the reference clip, requiring 90% recall
+  python tune.py --video videos/face_license_test.mp4 --annotations assets-json/face_license_test_annotations.json
+
+  # Custom sweep, then use the result
+  python tune.py --video videos/test.mp4 --annotations assets-json/test_annotations.json \\
+      --confidences 0.2,0.3 --imgsz 480,640 --strides 1,3 --min-recall 0.8
+  python main.py --config tuned_config.json
+        """
+    )
+    parser.add_argument("--video", "-v", type=str, required=True, help="Video to run every configuration on")
+    parser.add_argument("--annotations", "-a", type=str, required=True, help="Reference annotations JSON for the video")
+    parser.add_argument("--face-model", type=str, default="scripts/yolo11n-face.pt",
+                        help="Path to face detection model (default: scripts/yolo11n-face.pt)")
+    parser.add_argument("--license-model", type=str, default="scripts/license-plate-finetune-v1l.pt",
+                        help="Path to license plate detection model (default: scripts/license-plate-finetune-v1l.pt)")
+    parser.add_argument("--device", type=str, help="Inference device, e.g. 0 for CUDA device 0")
+    parser.add_argument("--confidences", type=str, default="0.15,0.25,0.4",
+                        help="Confidence thresholds to try (default: 0.15,0.25,0.4)")
+    parser.add_argument("--imgsz", type=str, default="default,480,640,960",
+                        help="Input sizes to try; 'default' keeps the model's (default: default,480,640,960)")
+    parser.add_argument("--coarse-imgsz", type=str, default="off",
+                        help="Coarse-to-fine sizes to try; 'off' disables it (default: off)")
+    parser.add_argument("--strides", type=str, default="1,2,4", help="Detect strides to try (default: 1,2,4)")
+    parser.add_argument("--backends", type=str, default="pt",
+                        help="Model exports to try, looked up next to each .pt model where `yolo export` "
+                             f"writes them; one of {', '.join(BACKEND_EXPORTS)} (default: pt)")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU needed for a match (default: 0.5)")
+    parser.add_argument("--min-recall", type=float, default=0.9, help="Recall floor for the recommendation (default: 0.9)")
+    parser.add_argument("--min-precision", type=float, default=0.0,
+                        help="Precision floor for the recommendation (default: 0.0)")
+    parser.add_argument("--output", "-o", type=str, default="tuned_config.json",
+                        help="Where to write the recommended config for main.py --config (default: tuned_config.json)")
+    parser.add_argument("--report", type=str, help="Optionally write every trial's results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's per-video output")
+    args = parser.parse_args()
+
+    if not Path(args.video).exists():
+        parser.error(f"Video file not found: {args.video}")
+    unknown = [b for b in parse_list(args.backends, str) if b not in BACKEND_EXPORTS]
+    if unknown:
+        parser.error(f"Unsupported backend(s): {', '.join(map(str, unknown))}")
+    with open(args.annotations) as f:
+        reference = json.load(f)
+
+    class_ids = {"face": 0, "license_plate": 1}
+    gt = annotations_to_arrays(reference["annotations"], class_ids)
+    print(f"Reference: {len(gt[0])} boxes in {len(reference['annotations'])} frames")
+
+    # imgsz is unused in coarse-to-fine mode, so those combinations collapse into one trial
+    grid = list(dict.fromkeys(
+        (confidence, None if coarse_imgsz else imgsz, coarse_imgsz, stride)
+        for confidence, imgsz, coarse_imgsz, stride in itertools.product(
+            parse_list(args.confidences, float),
+            parse_list(args.imgsz, int),
+            parse_list(args.coarse_imgsz, int),
+            parse_list(args.strides, int),
+        )
+    ))
+
+    results: List[TrialResult] = []
+    skipped: List[TrialResult] = []
+    for backend in parse_list(args.backends, str):
+        detectors = build_detectors(args, backend)
+        if detectors is None:
+            continue
+
+        # Warm up so the first trial is not charged for lazy initialisation
+        warmup = np.zeros((reference["video_info"]["height"], reference["video_info"]["width"], 3), dtype=np.uint8)
+        for det in detectors:
+            det.model(warmup, verbose=False)
+
+        for confidence, imgsz, coarse_imgsz, stride in grid:
+            config = {
+                "backend": backend,
+                "confidence": confidence,
+                "imgsz": imgsz,
+                "coarse_imgsz": coarse_imgsz,
+                "detect_stride": stride,
+            }
+            result = run_trial(detectors, config, args.video, gt, class_ids, args.iou, args.verbose)
+            if result.failures:
+                # e.g. a fixed-shape export run at another imgsz: its recall says nothing about the settings
+                print(f"[WARN] {format_config(config)}  skipped: {result.failures} failed inference runs "
+                      "(use --verbose to see the errors)")
+                skipped.append(result)
+                continue
+            results.append(result)
+            print(f"{format_config(config)}  {result.fps:7.1f} FPS  "
+                  f"recall {result.recall:.3f}  precision {result.precision:.3f}")
+
+    if not results:
+        print("No configuration could be run")
+        sys.exit(1)
+
+    front = pareto_front(results)
+    print(f"\nPareto-optimal configurations ({len(front)} of {len(results)}):")
+    for r in sorted(front, key=lambda r: -r.fps):
+        print(f"  {format_config(r.config)}  {r.fps:7.1f} FPS  recall {r.recall:.3f}  precision {r.precision:.3f}")
+
+    best = recommend(results, args.min_recall, args.min_precision)
+    print(f"\nRecommended: {format_config(best.config)}")
+
+    # Keys match main.py's argument names so the file can be passed to --config
+    recommended = {
+        "confidence": best.config["confidence"],
+        "imgsz": best.config["imgsz"],
+        "coarse_imgsz": best.config["coarse_imgsz"],
+        "detect_stride": best.config["detect_stride"],
+        "face_model": backend_model_path(args.face_model, best.config["backend"]),
+        "license_model": backend_model_path(args.license_model, best.config["backend"]),
+    }
+    with open(args.output, "w") as f:
+        json.dump(recommended, f, indent=2)
+    print(f"Recommended config saved to: {args.output}")
+
+    if args.report:
+        pareto_ids = {id(r) for r in front}
+        report = [
+            {
+                **r.config,
+                "fps": r.fps,
+                "recall": r.recall,
+                "precision": r.precision,
+                "true_positives": r.true_positives,
+                "predictions": r.predictions,
+                "ground_truth": r.ground_truth,
+                "failures": r.failures,
+                "pareto": id(r) in pareto_ids,
+            }
+            for r in results + skipped
+        ]
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Trial report saved to: {args.report}")
+
+
+if __name__ == "__main__":
+    main()